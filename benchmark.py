@@ -0,0 +1,1480 @@
+import argparse
+import base64
+import contextlib
+import hashlib
+import io
+import json
+import os
+import random
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import requests
+
+import pusher2
+
+# Local stand-in for api.github.com ################################################################
+
+# Fixture accounts and per-request counters shared by every handler thread
+FIXTURE_REPOS = [{"name": f"repo-{i:05d}", "html_url": f"http://localhost/repo-{i:05d}"} for i in range(2500)]
+STUB_STATS = {"requests": 0, "not_modified": 0}
+RATE_STATE = {"remaining": 0, "reset": 0.0}
+RATE_LOCK = threading.Lock()
+
+# Large file payloads are generated on the fly from a repeating 64 KiB block
+PAYLOAD_BLOCK = bytes(range(256)) * 256
+FIXTURE_FILES = {}
+
+def payload_chunks(size, offset=0):
+    while offset < size:
+        start = offset % len(PAYLOAD_BLOCK)
+        chunk = PAYLOAD_BLOCK[start:start + min(len(PAYLOAD_BLOCK) - start, size - offset)]
+        yield chunk
+        offset += len(chunk)
+
+def git_blob_sha(data):
+    hasher = pusher2.git_blob_hasher(len(data))
+    hasher.update(data)
+    return hasher.hexdigest()
+
+# In-memory fixture repository: blobs, trees and commits addressed by SHA, plus branch refs
+class StubRepo:
+    tree_limit = 100000  # entries in a recursive listing before the API reports "truncated"
+
+    def __init__(self, name, files, default_branch="main"):
+        self.name = name
+        self.default_branch = default_branch
+        self.blobs = {}
+        self.trees = {}
+        self.commits = {}
+        self.refs = {}
+        self.lock = threading.Lock()
+        if files:
+            tree_sha = self.build_tree(files)
+            self.refs[f"heads/{default_branch}"] = self.add_commit(tree_sha, [], "Initial commit")
+
+    def add_blob(self, data):
+        sha = git_blob_sha(data)
+        self.blobs[sha] = data
+        return sha
+
+    def add_tree(self, entries):
+        entries = sorted(entries, key=lambda entry: entry["path"])
+        sha = hashlib.sha1(("tree" + json.dumps(entries)).encode()).hexdigest()
+        self.trees[sha] = entries
+        return sha
+
+    def add_commit(self, tree_sha, parents, message):
+        sha = hashlib.sha1(json.dumps([tree_sha, parents, message, time.time()]).encode()).hexdigest()
+        self.commits[sha] = {"sha": sha, "tree": {"sha": tree_sha}, "parents": [{"sha": p} for p in parents], "message": message}
+        return sha
+
+    # Build nested trees from {"dir/file": bytes or existing tree entry} and return the root tree SHA
+    def build_tree(self, files):
+        children = {}
+        for path, data in files.items():
+            head, _, rest = path.partition("/")
+            if rest:
+                children.setdefault(head, {})[rest] = data
+            else:
+                children[head] = data
+        entries = []
+        for name, value in children.items():
+            if isinstance(value, dict) and "sha" in value:
+                entries.append(dict(value, path=name))
+            elif isinstance(value, dict):
+                entries.append({"path": name, "mode": "040000", "type": "tree", "sha": self.build_tree(value)})
+            else:
+                entries.append({"path": name, "mode": "100644", "type": "blob", "sha": self.add_blob(value), "size": len(value)})
+        return self.add_tree(entries)
+
+    # Branch name, commit SHA or tree SHA -> tree SHA
+    def resolve_tree(self, ref):
+        ref = self.refs.get(f"heads/{ref}", ref)
+        if ref in self.commits:
+            return self.commits[ref]["tree"]["sha"]
+        return ref if ref in self.trees else None
+
+    def flatten(self, tree_sha, prefix=""):
+        for entry in self.trees[tree_sha]:
+            yield dict(entry, path=prefix + entry["path"])
+            if entry["type"] == "tree":
+                yield from self.flatten(entry["sha"], prefix + entry["path"] + "/")
+
+    def tree_payload(self, tree_sha, recursive):
+        if not recursive:
+            return {"sha": tree_sha, "tree": self.trees[tree_sha], "truncated": False}
+        entries = []
+        for entry in self.flatten(tree_sha):
+            if len(entries) == self.tree_limit:
+                return {"sha": tree_sha, "tree": entries, "truncated": True}
+            entries.append(entry)
+        return {"sha": tree_sha, "tree": entries, "truncated": False}
+
+    # POST /git/trees: flat "dir/file" entries on top of an optional base tree
+    def create_tree(self, payload):
+        files = {}
+        if payload.get("base_tree"):
+            files = {e["path"]: e for e in self.flatten(payload["base_tree"]) if e["type"] == "blob"}
+        for entry in payload["tree"]:
+            if entry["sha"] not in self.blobs:
+                return None
+            files[entry["path"]] = {"mode": entry["mode"], "type": "blob", "sha": entry["sha"], "size": len(self.blobs[entry["sha"]])}
+        return self.build_tree({path: {k: v for k, v in e.items() if k != "path"} for path, e in files.items()})
+
+STUB_REPOS = {}
+
+# Fixture repo of `dirs` x `files_per_dir` small files, registered under owner "stub"
+def add_stub_repo(name, dirs=20, files_per_dir=250, size=256):
+    files = {f"dir-{d:03d}/sub/file-{f:04d}.txt": f"{name}/{d}/{f}".encode().ljust(size, b".")
+             for d in range(dirs) for f in range(files_per_dir)}
+    files["README.md"] = b"# fixture\n"
+    STUB_REPOS[name] = StubRepo(name, files)
+    return STUB_REPOS[name]
+
+# Register a generated file and return the contents-API style entry describing it
+def add_fixture_file(name, size, base_url):
+    hasher = pusher2.git_blob_hasher(size)
+    for chunk in payload_chunks(size):
+        hasher.update(chunk)
+    FIXTURE_FILES[name] = size
+    return {"name": name, "path": name, "type": "file", "size": size, "sha": hasher.hexdigest(),
+            "download_url": f"{base_url}/raw/{name}"}
+
+class StubGitHubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+    disable_nagle_algorithm = True
+    latency = 0.0  # simulated server think time per request, in seconds
+    quota = None  # requests per quota window; None disables the primary rate limit
+    quota_window = 2.0
+    secondary_rate = 0.0  # fraction of requests answered with a 429 secondary rate limit
+    error_rate = 0.0  # fraction of requests answered with a 502
+    reject_blobs = set()  # repository names whose blob uploads are refused with a 422
+
+    def end_headers(self):
+        if self.quota is not None:
+            self.send_header("X-RateLimit-Limit", str(self.quota))
+            self.send_header("X-RateLimit-Remaining", str(RATE_STATE["remaining"]))
+            self.send_header("X-RateLimit-Reset", str(int(RATE_STATE["reset"])))
+        super().end_headers()
+
+    # Apply the configured quota and failure injection; True when the request was answered here
+    def apply_limits(self):
+        STUB_STATS["requests"] += 1
+        time.sleep(self.latency)
+        if self.quota is not None and self.path != "/rate_limit":
+            with RATE_LOCK:
+                now = time.time()
+                if now >= RATE_STATE["reset"]:
+                    RATE_STATE.update(remaining=self.quota, reset=int(now + self.quota_window) + 1)
+                if RATE_STATE["remaining"] == 0:
+                    self.send_json(403, {"message": "API rate limit exceeded"})
+                    return True
+                RATE_STATE["remaining"] -= 1
+        roll = random.random()
+        if roll < self.secondary_rate:
+            self.send_json(429, {"message": "You have exceeded a secondary rate limit"}, {"Retry-After": "0.05"})
+            return True
+        if roll < self.secondary_rate + self.error_rate:
+            self.send_json(502, {"message": "Server Error"})
+            return True
+        return False
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    # Answer with 304 when the client already holds the current ETag of this payload
+    def send_json_etag(self, payload, headers=None):
+        etag = '"%s"' % hashlib.sha1(json.dumps(payload).encode()).hexdigest()
+        headers = dict(headers or {}, ETag=etag)
+        if self.headers.get("If-None-Match") == etag:
+            STUB_STATS["not_modified"] += 1
+            self.send_response(304)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_json(200, payload, headers)
+
+    def send_repo_page(self, query):
+        per_page = min(int(query.get("per_page", ["30"])[0]), 100)
+        page = int(query.get("page", ["1"])[0])
+        last = max(1, -(-len(FIXTURE_REPOS) // per_page))
+        links = []
+        if page < last:
+            links.append(f'<{self.base_url()}/user/repos?per_page={per_page}&page={page + 1}>; rel="next"')
+            links.append(f'<{self.base_url()}/user/repos?per_page={per_page}&page={last}>; rel="last"')
+        headers = {"Link": ", ".join(links)} if links else {}
+        self.send_json_etag(FIXTURE_REPOS[(page - 1) * per_page:page * per_page], headers)
+
+    # Raw file body with single-range support (bytes=N-)
+    def send_raw(self, name):
+        if name not in FIXTURE_FILES:
+            self.send_json(404, {"message": "Not Found"})
+            return
+        size = FIXTURE_FILES[name]
+        offset = 0
+        ranged = self.headers.get("Range", "")
+        if ranged.startswith("bytes="):
+            offset = int(ranged[len("bytes="):].split("-")[0])
+        self.send_response(206 if offset else 200)
+        self.send_header("Content-Length", str(size - offset))
+        if offset:
+            self.send_header("Content-Range", f"bytes {offset}-{size - 1}/{size}")
+        self.end_headers()
+        try:
+            for chunk in payload_chunks(size, offset):
+                self.wfile.write(chunk)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def base_url(self):
+        return f"http://{self.headers['Host']}"
+
+    def do_GET(self):
+        if self.apply_limits():
+            return
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        if url.path == "/rate_limit":
+            core = {"limit": self.quota, "remaining": RATE_STATE["remaining"], "reset": int(RATE_STATE["reset"])}
+            self.send_json(200, {"resources": {"core": core}, "rate": core})
+        elif url.path == "/user/repos":
+            self.send_repo_page(query)
+        elif url.path.startswith("/raw/"):
+            self.send_raw(url.path[len("/raw/"):])
+        elif url.path.startswith("/repos/"):
+            self.route_repo_get(url.path, query)
+        else:
+            self.send_json(404, {"message": "Not Found"})
+
+    # /repos/{owner}/{repo}[/git/trees/{ref} | /git/blobs/{sha}]
+    def route_repo_get(self, path, query):
+        parts = path.strip("/").split("/")
+        repo = STUB_REPOS.get(parts[2]) if len(parts) > 2 else None
+        if repo is None:
+            self.send_json(404, {"message": "Not Found"})
+        elif len(parts) == 3:
+            self.send_json_etag({"name": repo.name, "default_branch": repo.default_branch})
+        elif parts[3:] == ["contents"]:
+            root = repo.resolve_tree(repo.default_branch)
+            self.send_json(200, [
+                {"name": e["path"], "path": e["path"], "sha": e["sha"], "size": e.get("size"),
+                 "type": "file" if e["type"] == "blob" else "dir",
+                 "download_url": f"{self.base_url()}/repos/stub/{repo.name}/git/blobs/{e['sha']}" if e["type"] == "blob" else None}
+                for e in repo.trees[root]])
+        elif parts[3:5] == ["git", "trees"] and len(parts) == 6:
+            tree_sha = repo.resolve_tree(parts[5])
+            if tree_sha is None:
+                self.send_json(404, {"message": "Not Found"})
+            else:
+                self.send_json_etag(repo.tree_payload(tree_sha, query.get("recursive") == ["1"]))
+        elif parts[3:6] == ["git", "ref", "heads"] and len(parts) == 7:
+            sha = repo.refs.get(f"heads/{parts[6]}")
+            if sha is None:
+                self.send_json(404, {"message": "Not Found"})
+            else:
+                self.send_json(200, {"ref": f"refs/heads/{parts[6]}", "object": {"sha": sha, "type": "commit"}})
+        elif parts[3:5] == ["git", "commits"] and len(parts) == 6 and parts[5] in repo.commits:
+            self.send_json(200, repo.commits[parts[5]])
+        elif parts[3:5] == ["git", "blobs"] and len(parts) == 6 and parts[5] in repo.blobs:
+            body = repo.blobs[parts[5]]
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            self.send_json(404, {"message": "Not Found"})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        if self.apply_limits():
+            return
+        if self.path == "/user/repos" or self.path.startswith("/orgs/"):
+            self.create_repo(payload)
+        elif self.path.startswith("/repos/"):
+            self.route_repo_write(payload)
+        else:
+            self.send_json(404, {"message": "Not Found"})
+
+    def do_PATCH(self):
+        length = int(self.headers.get("Content-Length", 0))
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        if self.apply_limits():
+            return
+        self.route_repo_write(payload)
+
+    # POST /user/repos and /orgs/{org}/repos: list the repository, and with auto_init also serve it
+    # through the Git Data API with a README commit; 422 for a name that is already taken
+    def create_repo(self, payload):
+        owner = self.path.split("/")[2] if self.path.startswith("/orgs/") else "stub"
+        full_name = f"{owner}/{payload['name']}"
+        with RATE_LOCK:
+            if any(repo.get("full_name") == full_name for repo in FIXTURE_REPOS):
+                self.send_json(422, {"message": "Repository creation failed.",
+                                     "errors": [{"field": "name", "message": "name already exists on this account"}]})
+                return
+            FIXTURE_REPOS.append({"name": payload["name"], "full_name": full_name, "html_url": f"http://localhost/{full_name}"})
+        if payload.get("auto_init"):
+            STUB_REPOS[payload["name"]] = StubRepo(payload["name"], {"README.md": f"# {payload['name']}\n".encode()})
+        self.send_json(201, {"name": payload["name"], "full_name": full_name, "html_url": f"http://localhost/{full_name}"})
+
+    # Git Data API writes: blobs, trees, commits and refs
+    def route_repo_write(self, payload):
+        parts = self.path.strip("/").split("/")
+        repo = STUB_REPOS.get(parts[2]) if len(parts) > 2 else None
+        route = parts[3:5]
+        if repo is None:
+            self.send_json(404, {"message": "Not Found"})
+            return
+        with repo.lock:
+            if route == ["git", "blobs"] and repo.name in self.reject_blobs:
+                self.send_json(422, {"message": "Blob upload refused"})
+            elif route == ["git", "blobs"]:
+                sha = repo.add_blob(base64.b64decode(payload["content"]))
+                self.send_json(201, {"sha": sha})
+            elif route == ["git", "trees"]:
+                sha = repo.create_tree(payload)
+                if sha is None:
+                    self.send_json(422, {"message": "Invalid tree info"})
+                else:
+                    self.send_json(201, {"sha": sha, "tree": repo.trees[sha]})
+            elif route == ["git", "commits"]:
+                sha = repo.add_commit(payload["tree"], payload["parents"], payload["message"])
+                self.send_json(201, repo.commits[sha])
+            elif route == ["git", "refs"] and self.command == "POST":
+                repo.refs[payload["ref"][len("refs/"):]] = payload["sha"]
+                self.send_json(201, {"ref": payload["ref"], "object": {"sha": payload["sha"]}})
+            elif route == ["git", "refs"] and self.command == "PATCH":
+                repo.refs["/".join(parts[5:])] = payload["sha"]
+                self.send_json(200, {"ref": "refs/" + "/".join(parts[5:]), "object": {"sha": payload["sha"]}})
+            else:
+                self.send_json(404, {"message": "Not Found"})
+
+# Start the stub server on a free local port and return (server, base_url)
+def start_stub_server(handler=StubGitHubHandler):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+# Client for the stub server with pacing effectively disabled, so benchmarks measure transport
+def stub_client(base_url, **kwargs):
+    scheduler = pusher2.RateLimitScheduler(rate=100000, burst=100000)
+    return pusher2.GitHubClient("stub", "stub", base_url=base_url, scheduler=scheduler, **kwargs)
+
+def report(name, timings):
+    timings = sorted(timings)
+    p50 = statistics.median(timings) * 1000
+    p95 = timings[int(len(timings) * 0.95) - 1] * 1000
+    print(f"{name:<28} calls={len(timings):<5} p50={p50:7.3f} ms  p95={p95:7.3f} ms  total={sum(timings):6.3f} s")
+    return p50
+
+# Benchmarks #######################################################################################
+
+# Bare requests.get per call (old behaviour) vs the shared pooled GitHubClient session
+def bench_session(calls=500):
+    server, base_url = start_stub_server()
+    headers = {"Authorization": "token stub"}
+    try:
+        bare = []
+        for _ in range(calls):
+            start = time.perf_counter()
+            requests.get(f"{base_url}/user/repos", headers=headers).json()
+            bare.append(time.perf_counter() - start)
+
+        client = stub_client(base_url)
+        pooled = []
+        for _ in range(calls):
+            start = time.perf_counter()
+            client.get("/user/repos").json()
+            pooled.append(time.perf_counter() - start)
+        client.close()
+    finally:
+        server.shutdown()
+
+    bare_p50 = report("bare requests.get", bare)
+    pooled_p50 = report("pooled GitHubClient", pooled)
+    print(f"latency gain per call: {bare_p50 - pooled_p50:.3f} ms ({bare_p50 / pooled_p50:.2f}x)")
+
+# Full listing of a 2500-repo account: serial default-size pages vs concurrent 100-repo pages,
+# then a second pass that revalidates every page with If-None-Match
+def bench_list_repos(latency=0.02):
+    StubGitHubHandler.latency = latency
+    server, base_url = start_stub_server()
+    try:
+        client = stub_client(base_url)
+        start = time.perf_counter()
+        page, serial = 1, []
+        while True:
+            response = client.get("/user/repos", params={"page": page})
+            serial.extend(response.json())
+            if "next" not in response.links:
+                break
+            page += 1
+        print(f"serial per_page=30      repos={len(serial)}  requests={page}  {time.perf_counter() - start:.3f} s")
+
+        for label in ("concurrent per_page=100", "revalidated (ETag)"):
+            STUB_STATS.update(requests=0, not_modified=0)
+            start = time.perf_counter()
+            repos = pusher2.fetch_all_repositories(client)
+            assert [r["name"] for r in repos] == [r["name"] for r in serial], "concurrent listing differs from the serial one"
+            if label == "revalidated (ETag)":
+                assert STUB_STATS["not_modified"] == STUB_STATS["requests"], STUB_STATS
+            print(f"{label:<23} repos={len(repos)}  requests={STUB_STATS['requests']}  "
+                  f"304s={STUB_STATS['not_modified']}  {time.perf_counter() - start:.3f} s")
+        client.close()
+    finally:
+        StubGitHubHandler.latency = 0.0
+        server.shutdown()
+
+def peak_rss_mb():
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+# Download a 256 MiB file by streaming, then resume it from a half-written .part file,
+# and finally the old response.content approach to compare peak memory
+def bench_download(size=256 * 1024 * 1024):
+    server, base_url = start_stub_server()
+    client = stub_client(base_url)
+    try:
+        entry = add_fixture_file("big.bin", size, base_url)
+        with tempfile.TemporaryDirectory() as download_dir:
+            start = time.perf_counter()
+            pusher2.stream_download(entry, client, download_dir)
+            elapsed = time.perf_counter() - start
+            print(f"streamed     {size / 2**20:.0f} MiB in {elapsed:.3f} s  ({size / 2**20 / elapsed:.0f} MiB/s)  peak RSS {peak_rss_mb():.0f} MiB")
+
+            target = os.path.join(download_dir, "big.bin")
+            os.truncate(target, size // 2)
+            os.rename(target, target + ".part")
+            start = time.perf_counter()
+            transferred = pusher2.stream_download(entry, client, download_dir)
+            assert transferred == size - size // 2 and os.path.getsize(target) == size, "resume did not complete the file"
+            print(f"resumed      {transferred / 2**20:.0f} MiB in {time.perf_counter() - start:.3f} s  peak RSS {peak_rss_mb():.0f} MiB")
+
+            start = time.perf_counter()
+            body = client.get(entry["download_url"]).content
+            assert len(body) == size
+            print(f"in-memory    {len(body) / 2**20:.0f} MiB in {time.perf_counter() - start:.3f} s  peak RSS {peak_rss_mb():.0f} MiB")
+    finally:
+        client.close()
+        server.shutdown()
+
+# 500 small config files with 20 ms of server latency: one at a time vs download_files
+def bench_bulk_download(count=500, latency=0.02):
+    StubGitHubHandler.latency = latency
+    server, base_url = start_stub_server()
+    client = stub_client(base_url)
+    try:
+        files = [add_fixture_file(f"config/{i:03d}.yml", 4096, base_url) for i in range(count)]
+        with tempfile.TemporaryDirectory() as download_dir:
+            start = time.perf_counter()
+            for file in files:
+                pusher2.stream_download(file, client, download_dir)
+            print(f"serial    {count} files in {time.perf_counter() - start:.3f} s")
+        with tempfile.TemporaryDirectory() as download_dir:
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                downloaded, failed = pusher2.download_files(files, client, download_dir)
+            assert len(downloaded) == count and not failed, failed
+            print(f"parallel  {count} files in {time.perf_counter() - start:.3f} s")
+    finally:
+        StubGitHubHandler.latency = 0.0
+        client.close()
+        server.shutdown()
+
+# Index a 5000-file repo with one recursive tree call, then with a tree limit that forces
+# the truncated fallback to walk subtrees in parallel
+def bench_tree(latency=0.02):
+    StubGitHubHandler.latency = latency
+    server, base_url = start_stub_server()
+    client = stub_client(base_url)
+    repo = add_stub_repo("tree-fixture")
+    try:
+        for label, limit in (("recursive", StubRepo.tree_limit), ("truncated", 1000)):
+            repo.tree_limit = limit
+            client._etag_cache.clear()
+            STUB_STATS.update(requests=0)
+            start = time.perf_counter()
+            index = pusher2.fetch_repo_tree(client, "stub", repo.name)
+            listing = [(entry["path"], entry["sha"]) for entry in index.files()]
+            if label == "recursive":
+                expected = listing
+            assert listing == expected, "truncated walk disagrees with the recursive listing"
+            print(f"{label:<10} files={len(index.files())}  dirs={len(index.directories())}  "
+                  f"requests={STUB_STATS['requests']}  {time.perf_counter() - start:.3f} s")
+        start = time.perf_counter()
+        matches = index.files(pattern="dir-01*/sub/*7.txt")
+        print(f"glob filter matches={len(matches)}  {(time.perf_counter() - start) * 1000:.2f} ms")
+    finally:
+        StubGitHubHandler.latency = 0.0
+        client.close()
+        server.shutdown()
+
+# Wrap subprocess.Popen to count spawned processes; shell=True costs an extra /bin/sh
+class SpawnCounter:
+    def __init__(self):
+        self.count = 0
+        self.original = subprocess.Popen
+
+    def __enter__(self):
+        counter = self
+
+        class CountingPopen(self.original):
+            def __init__(self, args, *rest, **kwargs):
+                counter.count += 2 if kwargs.get("shell") else 1
+                super().__init__(args, *rest, **kwargs)
+
+        subprocess.Popen = CountingPopen
+        return self
+
+    def __exit__(self, *exc):
+        subprocess.Popen = self.original
+
+# Local repository with `commits` commits, written in one git fast-import run
+def make_history_repo(path, commits=20000):
+    subprocess.run(["git", "init", "-q", path], check=True)
+    stream = []
+    for i in range(commits):
+        data = f"change {i}\n"
+        stream.append(f"commit refs/heads/main\ncommitter Bench <bench@example.com> {1700000000 + i} +0000\n"
+                      f"data {len(data)}\n{data}M 644 inline file.txt\ndata {len(data)}\n{data}\n")
+    subprocess.run(["git", "fast-import", "--quiet"], cwd=path, input="".join(stream), text=True, check=True)
+    subprocess.run(["git", "symbolic-ref", "HEAD", "refs/heads/main"], cwd=path, check=True)
+    subprocess.run(["git", "remote", "add", "origin", "https://github.com/stub/history.git"], cwd=path, check=True)
+
+# The serial shell=True probes option 2 used to run before pushing
+def legacy_probe():
+    run = lambda command: subprocess.run(command, shell=True, text=True, capture_output=True)
+    is_repo = run("git rev-parse --is-inside-work-tree").returncode == 0
+    has_commits = run("git log").returncode == 0
+    name, email = run("git config user.name").stdout.strip(), run("git config user.email").stdout.strip()
+    remotes = run("git remote -v").stdout
+    return is_repo, has_commits, name, email, remotes
+
+# Old serial subprocess chain vs probe_repo_state on a repo with a long history
+def bench_probe(rounds=20):
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as path:
+        make_history_repo(path)
+        os.chdir(path)
+        try:
+            for label, probe in (("legacy chain", legacy_probe),
+                                 ("probe_repo_state", lambda: pusher2.probe_repo_state(refresh=True)),
+                                 ("cached snapshot", pusher2.probe_repo_state)):
+                timings = []
+                with SpawnCounter() as counter:
+                    for _ in range(rounds):
+                        start = time.perf_counter()
+                        probe()
+                        timings.append(time.perf_counter() - start)
+                report(label, timings)
+                print(f"{'':<28} processes per probe={counter.count / rounds:.0f}")
+        finally:
+            os.chdir(cwd)
+
+# 20 credential lookups against a fake backend that takes 50 ms like a D-Bus keyring,
+# uncached (ttl=0) vs the in-process cache
+def bench_credentials(lookups=20, delay=0.05):
+    for label, ttl in (("uncached", 0), ("cached", 300)):
+        backend = pusher2.MemoryBackend("stub", "stub-token", delay=delay)
+        provider = pusher2.CredentialProvider([backend], ttl=ttl)
+        start = time.perf_counter()
+        for _ in range(lookups):
+            provider.get()
+        assert backend.loads == (lookups if ttl == 0 else 1)
+        print(f"{label:<9} lookups={lookups}  backend loads={backend.loads}  {time.perf_counter() - start:.3f} s")
+
+# Cold start of each CLI subcommand in a fresh interpreter against the stub server, plus
+# which heavy modules it ended up importing
+def bench_cli_startup(runs=5):
+    server, base_url = start_stub_server()
+    add_stub_repo("cli-fixture", dirs=2, files_per_dir=3)
+    script = os.path.abspath(pusher2.__file__)
+    env = dict(os.environ, GITHUB_API_URL=base_url, PUSHER_CREDENTIAL_BACKENDS="env",
+               GITHUB_USERNAME="stub", GITHUB_TOKEN="stub")
+    with tempfile.TemporaryDirectory() as work:
+        repo = os.path.join(work, "repo")
+        subprocess.run(["git", "init", "-q", repo], check=True)
+        commands = [
+            ("--help", ["--help"], work),
+            ("push (not a repo)", ["push", "demo"], work),
+            ("update (no changes)", ["update", "-m", "nothing"], repo),
+            ("create", ["create", "demo"], work),
+            ("ls-repos", ["ls-repos"], work),
+            ("ls-files", ["ls-files", "cli-fixture", "-r"], work),
+            ("download", ["download", "cli-fixture", "all", "--dest", os.path.join(work, "dl")], work),
+        ]
+        try:
+            baseline = []
+            for _ in range(runs):
+                start = time.perf_counter()
+                subprocess.run([sys.executable, "-c", "pass"], env=env)
+                baseline.append(time.perf_counter() - start)
+            print(f"{'python -c pass':<22} {statistics.median(baseline) * 1000:7.1f} ms")
+            for label, argv, cwd in commands:
+                timings = []
+                for _ in range(runs):
+                    start = time.perf_counter()
+                    result = subprocess.run([sys.executable, "-X", "importtime", script] + argv, cwd=cwd, env=env,
+                                            capture_output=True, text=True)
+                    timings.append(time.perf_counter() - start)
+                heavy = [name for name in ("requests", "keyring") if re.search(rf"\| +{name}(\.|$)", result.stderr, re.M)]
+                print(f"{label:<22} {statistics.median(timings) * 1000:7.1f} ms  exit={result.returncode}  "
+                      f"imports={','.join(heavy) or '-'}")
+        finally:
+            server.shutdown()
+
+# 300 calls against a stub with a 100-request quota per 2 s window, 3% secondary rate limits
+# and 2% 502s: bare session vs the scheduler, which paces, waits for resets and retries
+def bench_rate_limit(calls=300):
+    StubGitHubHandler.quota, StubGitHubHandler.secondary_rate, StubGitHubHandler.error_rate = 100, 0.03, 0.02
+    RATE_STATE.update(remaining=0, reset=0.0)
+    server, base_url = start_stub_server()
+    try:
+        session = requests.Session()
+        start = time.perf_counter()
+        failed = sum(session.get(f"{base_url}/user/repos").status_code != 200 for _ in range(calls))
+        print(f"bare session  calls={calls}  failed={failed}  {time.perf_counter() - start:.3f} s")
+
+        scheduler = pusher2.RateLimitScheduler(backoff_base=0.05, backoff_max=1.0)
+        client = pusher2.GitHubClient("stub", "stub", base_url=base_url, scheduler=scheduler)
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            statuses = list(pool.map(lambda _: client.get("/user/repos").status_code, range(calls)))
+        failed = sum(status != 200 for status in statuses)
+        assert failed == 0, f"{failed} calls failed under the scheduler"
+        print(f"scheduler     calls={calls}  failed={failed}  {time.perf_counter() - start:.3f} s")
+        print(f"quota stats   {json.dumps(client.rate_limit_stats()['scheduler'])}")
+        client.close()
+    finally:
+        StubGitHubHandler.quota, StubGitHubHandler.secondary_rate, StubGitHubHandler.error_rate = None, 0.0, 0.0
+        server.shutdown()
+
+# Throughput of 2000 small downloads with 10 ms server latency: serial sync, threaded
+# download_files (32 workers) and the asyncio engine (32 in flight)
+def bench_engines(count=2000, latency=0.01, concurrency=32):
+    StubGitHubHandler.latency = latency
+    server, base_url = start_stub_server()
+    client = stub_client(base_url, pool_size=concurrency)
+    try:
+        files = [add_fixture_file(f"engine/{i:04d}.json", 2048, base_url) for i in range(count)]
+        engines = (
+            ("sync (serial)", lambda d: [pusher2.stream_download(f, client, d) for f in files[:count // 10]], count // 10),
+            ("threaded", lambda d: pusher2.download_files(files, client, d, max_workers=concurrency), count),
+            ("asyncio", lambda d: pusher2.download_files_async(files, client, d, concurrency=concurrency), count),
+        )
+        for label, run, n in engines:
+            with tempfile.TemporaryDirectory() as download_dir:
+                start = time.perf_counter()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    run(download_dir)
+                elapsed = time.perf_counter() - start
+                assert sum(len(names) for _, _, names in os.walk(download_dir)) == n, f"{label} missed files"
+                print(f"{label:<14} files={n:<5} {elapsed:7.3f} s  {n / elapsed:8.1f} files/s")
+    finally:
+        StubGitHubHandler.latency = 0.0
+        client.close()
+        server.shutdown()
+
+# Publish a 3000-file directory through the Git Data API, change 10 files and publish again,
+# then check the remote tree matches the local blob SHAs
+def bench_api_push(files=3000, changed=10):
+    server, base_url = start_stub_server()
+    client = stub_client(base_url)
+    repo = add_stub_repo("api-push-fixture", dirs=1, files_per_dir=1)
+    try:
+        with tempfile.TemporaryDirectory() as source:
+            for i in range(files):
+                path = os.path.join(source, f"configs/group-{i % 30:02d}/node-{i:05d}.conf")
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, "w") as f:
+                    f.write(f"node={i}\nrole=worker\n" * 8)
+            for label in ("initial", "incremental"):
+                if label == "incremental":
+                    for i in range(changed):
+                        with open(os.path.join(source, f"configs/group-{i % 30:02d}/node-{i:05d}.conf"), "a") as f:
+                            f.write("updated=1\n")
+                start = time.perf_counter()
+                stats = pusher2.api_push(client, repo.name, source, message=f"{label} export")
+                assert stats["blobs_uploaded"] == (files if label == "initial" else changed), stats
+                print(f"{label:<12} files={stats['files']}  blobs uploaded={stats['blobs_uploaded']}  "
+                      f"skipped={stats['blobs_skipped']}  requests={stats['requests']}  "
+                      f"bytes={stats['bytes_uploaded']}  {time.perf_counter() - start:.3f} s")
+            remote = {e["path"]: e["sha"] for e in repo.flatten(repo.resolve_tree("main")) if e["type"] == "blob"}
+            local = {path: pusher2.local_blob_sha(full) for path, (full, _) in pusher2.collect_push_files(source).items()}
+            assert remote == local, "remote tree does not match the local directory"
+            print("remote tree matches local directory")
+    finally:
+        client.close()
+        server.shutdown()
+
+# Synthetic work tree of `files` files (1000 per directory) next to an ignored build/ tree of
+# `ignored` files, committed once; then 100 files are modified and 10 deleted and the change is
+# staged with plain `git add -A`, with stage_changes in the default "git" mode (untracked cache
+# enabled) and with stage_changes in "scan" mode
+def bench_stage(files=200000, ignored=50000, modified=100, deleted=10):
+    git = lambda *args: subprocess.run(["git"] + list(args), cwd=work, capture_output=True, text=True, check=True)
+    with tempfile.TemporaryDirectory() as work:
+        start = time.perf_counter()
+        for prefix, count in (("", files), ("build/", ignored)):
+            for i in range(count):
+                directory = os.path.join(work, f"{prefix}d{i // 1000:04d}")
+                if i % 1000 == 0:
+                    os.makedirs(directory)
+                with open(os.path.join(directory, f"f{i % 1000:04d}.txt"), "w") as f:
+                    f.write(f"{i}\n")
+        with open(os.path.join(work, ".gitignore"), "w") as f:
+            f.write("build/\n")
+        git("init", "-q")
+        git("config", "user.name", "Bench")
+        git("config", "user.email", "bench@example.com")
+        git("add", "-A")
+        git("commit", "-qm", "initial")
+        print(f"setup        {files} files ({ignored} ignored) committed in {time.perf_counter() - start:.1f} s")
+
+        def touch():
+            for i in range(modified):
+                with open(os.path.join(work, f"d{i % (files // 1000):04d}", f"f{i // (files // 1000):04d}.txt"), "a") as f:
+                    f.write("changed\n")
+            for i in range(deleted):
+                path = os.path.join(work, f"d{(i + 7) % (files // 1000):04d}", f"f{999 - i:04d}.txt")
+                if os.path.exists(path):
+                    os.remove(path)
+                else:
+                    with open(path, "w") as f:
+                        f.write("restored\n")
+
+        for label, stage in (("git add -A", lambda: git("add", "-A")),
+                             ("stage_changes (git mode)", lambda: pusher2.stage_changes(work, mode="git")),
+                             ("stage_changes (scan mode)", lambda: pusher2.stage_changes(work, mode="scan"))):
+            if "git mode" in label:
+                pusher2.stage_changes(work, mode="git")  # enables and populates the untracked cache
+            if "scan mode" in label:
+                # baseline the scan index (the first scan-mode run is a full `git add -A`)
+                pusher2.save_stage_index(pusher2.stage_changes(work, mode="scan"))
+            touch()
+            start = time.perf_counter()
+            result = stage()
+            elapsed = time.perf_counter() - start
+            git("commit", "-qm", "change")
+            if isinstance(result, pusher2.StageResult):
+                assert result.ok and result.changed + result.deleted == modified + deleted, result
+                pusher2.save_stage_index(result)
+                label += f" ({result.changed} changed, {result.deleted} deleted)"
+            print(f"{label:<48} {elapsed:.3f} s")
+        with open(os.path.join(work, ".git", pusher2.STAGE_INDEX_NAME)) as f:
+            saved = json.load(f)
+        assert saved["ignored_dirs"] == ["build"] and not any(p.startswith("build/") for p in saved["files"])
+        print(f"scan index   {len(saved['files'])} files, ignored dirs {saved['ignored_dirs']}")
+
+# pre-receive hook for local bare remotes: rejects pushes after the count in $GIT_DIR/fail-after
+FAILING_HOOK = """#!/bin/sh
+n=$(cat "$GIT_DIR/push-count" 2>/dev/null || echo 0); n=$((n+1)); echo $n > "$GIT_DIR/push-count"
+if [ -f "$GIT_DIR/fail-after" ] && [ $n -gt $(cat "$GIT_DIR/fail-after") ]; then echo "simulated outage" >&2; exit 1; fi
+"""
+
+def make_bare_remote(path, failing_hook=False):
+    subprocess.run(["git", "init", "-q", "--bare", path], check=True)
+    if failing_hook:
+        hook = os.path.join(path, "hooks", "pre-receive")
+        with open(hook, "w") as f:
+            f.write(FAILING_HOOK)
+        os.chmod(hook, 0o755)
+    return path
+
+# Work tree of `dirs` directories holding `files_per_dir` random files of `size` bytes each
+def make_work_tree(path, dirs=8, files_per_dir=8, size=1024 * 1024):
+    subprocess.run(["git", "init", "-q", path], check=True)
+    subprocess.run(["git", "config", "user.name", "Bench"], cwd=path, check=True)
+    subprocess.run(["git", "config", "user.email", "bench@example.com"], cwd=path, check=True)
+    for d in range(dirs):
+        os.makedirs(os.path.join(path, f"dir{d:02d}"), exist_ok=True)
+        for f in range(files_per_dir):
+            with open(os.path.join(path, f"dir{d:02d}", f"f{f:02d}.bin"), "wb") as out:
+                out.write(os.urandom(size))
+
+# 64 MiB initial publish in 8 MiB commits to a local bare remote that fails after 4 pushes,
+# then the resumed run
+def bench_chunked_publish(chunk_bytes=8 * 1024 * 1024):
+    with tempfile.TemporaryDirectory() as work:
+        remote = make_bare_remote(os.path.join(work, "remote.git"), failing_hook=True)
+        with open(os.path.join(remote, "fail-after"), "w") as f:
+            f.write("4")
+        tree = os.path.join(work, "tree")
+        make_work_tree(tree)
+        for label in ("interrupted", "resumed"):
+            if label == "resumed":
+                os.remove(os.path.join(remote, "fail-after"))
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                ok = pusher2.chunked_publish(remote, "main", tree, max_bytes=chunk_bytes)
+            pushed = subprocess.run(["git", "rev-list", "--count", "main"], cwd=remote, capture_output=True, text=True).stdout.strip()
+            print(f"{label:<12} ok={ok}  commits on remote={pushed or 0}  {time.perf_counter() - start:.3f} s")
+            assert (ok, int(pushed or 0)) == ((False, 4) if label == "interrupted" else (True, 8))
+        local_head, remote_head = (subprocess.run(["git", "rev-parse", ref], cwd=cwd, capture_output=True, text=True).stdout
+                                   for cwd, ref in ((tree, "HEAD"), (remote, "main")))
+        assert local_head == remote_head, "remote main is not the local HEAD"
+
+# Push a 64 MiB tree to a local bare remote through the streaming runner and check that
+# progress arrives while the push runs, not only at exit
+def bench_push_progress(size=64 * 1024 * 1024):
+    with tempfile.TemporaryDirectory() as work:
+        remote = make_bare_remote(os.path.join(work, "remote.git"))
+        tree = os.path.join(work, "tree")
+        make_work_tree(tree, dirs=4, files_per_dir=4, size=size // 16)
+        subprocess.run("git add -A && git commit -qm init", shell=True, cwd=tree, check=True)
+        events = []
+        metrics = pusher2.run_git_streaming(["git", "push", "--progress", remote, "HEAD:main"], cwd=tree,
+                                            progress=lambda event: events.append((time.perf_counter(), event)))
+        writing = [stamp for stamp, event in events if event["phase"] == "Writing objects"]
+        spread = writing[-1] - writing[0] if writing else 0
+        print(f"push         rc={metrics.returncode}  {metrics.summary()}")
+        print(f"progress     {len(events)} events, writing updates spread over {spread:.2f} s of {metrics.duration:.2f} s")
+        assert metrics.returncode == 0 and len(writing) > 1, "no progress while writing objects"
+
+# Cost of the pre-commit large-file check on a 50k-file initial commit and on an update
+# touching 100 files, with two files over a 1 MiB limit in each case
+def bench_large_files(dirs=100, files_per_dir=500):
+    with tempfile.TemporaryDirectory() as work:
+        tree = os.path.join(work, "tree")
+        make_work_tree(tree, dirs=dirs, files_per_dir=files_per_dir, size=64)
+        for label in ("initial", "update"):
+            if label == "update":
+                subprocess.run(["git", "commit", "-qm", "init"], cwd=tree, check=True)
+                for d in range(100):
+                    with open(os.path.join(tree, f"dir{d % dirs:02d}", f"f{d:02d}.bin"), "ab") as out:
+                        out.write(b"changed")
+            for n in range(2):
+                with open(os.path.join(tree, f"{label}-{n}.bin"), "wb") as out:
+                    out.write(os.urandom(2 * 1024 * 1024))
+            subprocess.run(["git", "add", "-A"], cwd=tree, check=True)
+            with contextlib.redirect_stdout(io.StringIO()):
+                scan = pusher2.check_large_files(tree, "exclude", limit=1024 * 1024, warn=1024 * 1024)
+            assert sorted(path for path, _ in scan.oversized) == [f"{label}-0.bin", f"{label}-1.bin"], scan.oversized
+            print(f"{label:<8} {scan.scanned:>6} staged files  {len(scan.oversized)} over the limit  "
+                  f"{scan.seconds * 1000:7.1f} ms")
+
+# Cost of the tracing hooks: a span while tracing is off, 500 API calls with tracing off and on,
+# and the spans recorded for a traced push to a local bare remote
+def bench_tracing(calls=500, spans=200000):
+    tracer = pusher2.TRACER
+    start = time.perf_counter()
+    for _ in range(spans):
+        with tracer.span("noop", "bench", attribute=1) as span:
+            span.set(value=2)
+    print(f"disabled span   {(time.perf_counter() - start) / spans * 1e9:6.0f} ns per span")
+
+    server, base_url = start_stub_server()
+    client = stub_client(base_url)
+    try:
+        for label in ("tracing off", "tracing on"):
+            if label == "tracing on":
+                tracer.enable(None)
+            timings = []
+            for _ in range(calls):
+                begin = time.perf_counter()
+                client.get("/user/repos").json()
+                timings.append(time.perf_counter() - begin)
+            report(label, timings)
+    finally:
+        client.close()
+        server.shutdown()
+
+    tracer.events.clear()
+    with tempfile.TemporaryDirectory() as work:
+        remote = make_bare_remote(os.path.join(work, "remote.git"))
+        tree = os.path.join(work, "tree")
+        make_work_tree(tree, dirs=2, files_per_dir=4, size=64 * 1024)
+        cwd = os.getcwd()
+        os.chdir(tree)
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                pusher2.invalidate_repo_state()
+                pusher2.verify_and_create_commit()
+                pusher2.run_git_command(f"git push --progress {remote} HEAD:main", progress=lambda event: None)
+        finally:
+            os.chdir(cwd)
+        trace = os.path.join(work, "trace.json")
+        with contextlib.redirect_stderr(io.StringIO()):
+            tracer.export(trace)
+        with open(trace) as f:
+            events = json.load(f)["traceEvents"]
+    assert events, "the traced push recorded no spans"
+    by_category = {}
+    for event in events:
+        total = by_category.setdefault(event["cat"], [0, 0.0])
+        total[0] += 1
+        total[1] += event["dur"] / 1000
+    for category, (count, duration) in sorted(by_category.items()):
+        print(f"traced push     {category:<10} spans={count:<4} {duration:8.1f} ms")
+
+# 200 files of 64 KiB with 20 ms of server latency: a cold download filling the blob cache, the
+# same files into another directory from the cache, a corrupted entry, and eviction under a cap
+def bench_download_cache(count=200, size=64 * 1024, latency=0.02):
+    StubGitHubHandler.latency = latency
+    server, base_url = start_stub_server()
+    client = stub_client(base_url)
+    repo = add_stub_repo("cache-fixture", dirs=4, files_per_dir=count // 4, size=size)
+    try:
+        files = [f for f in pusher2.fetch_repo_tree(client, "stub", repo.name).files() if f["size"] == size]
+        with tempfile.TemporaryDirectory() as work:
+            cache = pusher2.BlobCache(os.path.join(work, "cache"), max_bytes=1024 * 1024 * 1024)
+            for label in ("cold", "warm", "corrupted"):
+                if label == "corrupted":
+                    with open(cache.path(files[0]["sha"]), "r+b") as f:
+                        f.write(b"X")
+                STUB_STATS.update(requests=0)
+                start = time.perf_counter()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    downloaded, failed = pusher2.download_files(files, client, os.path.join(work, label), cache=cache)
+                assert len(downloaded) == len(files) and not failed, failed
+                assert STUB_STATS["requests"] == {"cold": len(files), "warm": 0, "corrupted": 1}[label], STUB_STATS
+                print(f"{label:<10} {len(downloaded)} files  requests={STUB_STATS['requests']:<4} "
+                      f"{time.perf_counter() - start:.3f} s  {cache.stats}")
+            cache.max_bytes = count // 2 * size
+            cache.evict()
+            assert cache.scan_size() <= cache.max_bytes
+            print(f"evicted to {count // 2 * size // 1024} KiB cap: {len(cache.entries())} blobs left, {cache.stats['evicted']} evicted")
+    finally:
+        StubGitHubHandler.latency = 0.0
+        client.close()
+        server.shutdown()
+
+# Mirror a 2000-file repo with 20 ms of server latency: the first sync, an unchanged re-sync,
+# an upstream change (10 modified, 5 added, 5 removed) and a re-sync after local edits
+def bench_sync(latency=0.02):
+    StubGitHubHandler.latency = latency
+    server, base_url = start_stub_server()
+    client = stub_client(base_url)
+    files = {f"dir-{d:02d}/file-{f:03d}.txt": f"{d}/{f}".encode().ljust(1024, b".") for d in range(20) for f in range(100)}
+    STUB_REPOS["sync-fixture"] = StubRepo("sync-fixture", files)
+    try:
+        with tempfile.TemporaryDirectory() as dest:
+            for label in ("first sync", "unchanged", "upstream change", "local edits"):
+                if label == "upstream change":
+                    changed = dict(files)
+                    for n in range(10):
+                        changed[f"dir-00/file-{n:03d}.txt"] = b"changed %d" % n
+                    for n in range(5):
+                        changed[f"new/file-{n}.txt"] = b"new %d" % n
+                        del changed[f"dir-19/file-{n:03d}.txt"]
+                    STUB_REPOS["sync-fixture"] = StubRepo("sync-fixture", changed)
+                if label == "local edits":
+                    for n in range(3):
+                        with open(os.path.join(dest, f"dir-05/file-{n:03d}.txt"), "ab") as f:
+                            f.write(b"local edit")
+                start = time.perf_counter()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    result = pusher2.sync_repository(client, "sync-fixture", dest, owner="stub", delete=True)
+                expected = {"first sync": (len(files), 0, 0, 0), "unchanged": (0, 0, 0, 0),
+                            "upstream change": (5, 10, 0, 5), "local edits": (0, 0, 3, 0)}[label]
+                assert (result["added"], result["updated"], result["restored"], len(result["deleted"])) == expected, result
+                print(f"{label:<16} requests={result['requests']:<5} added={result['added']:<5} updated={result['updated']:<3} "
+                      f"restored={result['restored']:<3} deleted={len(result['deleted']):<3} {time.perf_counter() - start:.3f} s")
+    finally:
+        StubGitHubHandler.latency = 0.0
+        client.close()
+        server.shutdown()
+
+# 500 of 2000 files from a repo served both by the stub API (20 ms latency) and as a local
+# file:// remote: per-file API downloads vs one sparse partial clone, and what auto picks
+def bench_fetch_modes(count=2000, selected=500, size=4096, latency=0.02):
+    files = {f"dir-{n // 100:02d}/file-{n:04d}.txt": os.urandom(size // 2).hex().encode() for n in range(count)}
+    STUB_REPOS["fetch-fixture"] = StubRepo("fetch-fixture", files)
+    StubGitHubHandler.latency = latency
+    server, base_url = start_stub_server()
+    client = stub_client(base_url)
+    try:
+        with tempfile.TemporaryDirectory() as work:
+            source = os.path.join(work, "source")
+            os.makedirs(source)
+            for path, data in files.items():
+                os.makedirs(os.path.join(source, os.path.dirname(path)), exist_ok=True)
+                with open(os.path.join(source, path), "wb") as f:
+                    f.write(data)
+            subprocess.run("git init -q -b main && git add -A && git -c user.name=b -c user.email=b@b commit -qm init",
+                           shell=True, cwd=source, check=True)
+            remote = os.path.join(work, "stub", "fetch-fixture.git")
+            subprocess.run(["git", "clone", "-q", "--bare", source, remote], check=True)
+            subprocess.run(["git", "config", "uploadpack.allowFilter", "true"], cwd=remote, check=True)
+            pusher2.GITHUB_URL = "file://" + work
+
+            index = pusher2.fetch_repo_tree(client, "stub", "fetch-fixture")
+            selection = index.files()[::count // selected]
+            print(f"auto picks '{pusher2.choose_fetch_mode(selection)}' for {len(selection)} files, "
+                  f"'{pusher2.choose_fetch_mode(selection[:10])}' for 10")
+            for mode in ("api", "clone"):
+                dest = os.path.join(work, mode)
+                STUB_STATS.update(requests=0)
+                start = time.perf_counter()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    downloaded, failed, _ = pusher2.fetch_selected_files(client, "stub", "fetch-fixture", selection, dest, mode)
+                elapsed = time.perf_counter() - start
+                intact = sum(pusher2.hash_file_into(pusher2.git_blob_hasher(f["size"]), os.path.join(dest, f["path"])).hexdigest() == f["sha"]
+                             for f in selection if os.path.exists(os.path.join(dest, f["path"])))
+                assert len(downloaded) == intact == len(selection) and not failed, failed
+                print(f"{mode:<6} {len(downloaded)} files ({intact} verified)  API requests={STUB_STATS['requests']:<4} {elapsed:.3f} s")
+    finally:
+        StubGitHubHandler.latency = 0.0
+        client.close()
+        server.shutdown()
+
+# Local index of a 300-repo account with 200 files per repo (20 ms latency): the first refresh,
+# a refresh after 5 repositories were pushed to, and offline searches
+def bench_index(repos=300, files_per_repo=200, latency=0.02):
+    saved = list(FIXTURE_REPOS)
+    FIXTURE_REPOS[:] = [{"name": f"idx-{n:03d}", "full_name": f"stub/idx-{n:03d}", "html_url": f"http://localhost/idx-{n:03d}",
+                         "default_branch": "main", "size": 10, "pushed_at": "2026-01-01T00:00:00Z"} for n in range(repos)]
+    for repo in FIXTURE_REPOS:
+        add_stub_repo(repo["name"], dirs=4, files_per_dir=files_per_repo // 4, size=64)
+    StubGitHubHandler.latency = latency
+    server, base_url = start_stub_server()
+    client = stub_client(base_url)
+    try:
+        with tempfile.TemporaryDirectory() as work:
+            index = pusher2.RepoIndex(os.path.join(work, "index.sqlite3"))
+            for label in ("first refresh", "5 repos pushed"):
+                if label == "5 repos pushed":
+                    for repo in FIXTURE_REPOS[:5]:
+                        repo["pushed_at"] = "2026-02-01T00:00:00Z"
+                client._etag_cache.clear()
+                start = time.perf_counter()
+                stats = index.refresh(client)
+                assert stats["refreshed"] == (repos if label == "first refresh" else 5), stats
+                print(f"{label:<15} refreshed={stats['refreshed']:<4} unchanged={stats['unchanged']:<4} "
+                      f"requests={stats['requests']:<4} {time.perf_counter() - start:.3f} s")
+            sha = index.search_files(pattern="*file-0007.txt", repo="idx-042")[0]["sha"]
+            assert any(found["repo"].endswith("idx-042") for found in index.search_files(sha=sha))
+            for label, search in (("name", lambda: index.search_repos("x-04")),
+                                  ("path glob", lambda: index.search_files(pattern="dir-002/*/file-0042.txt")),
+                                  ("suffix glob", lambda: index.search_files(pattern="*file-0042.txt")),
+                                  ("blob sha", lambda: index.search_files(sha=sha))):
+                timings = []
+                for _ in range(20):
+                    start = time.perf_counter()
+                    found = search()
+                    timings.append(time.perf_counter() - start)
+                print(f"search {label:<12} matches={len(found):<4} p50={statistics.median(timings) * 1000:.2f} ms")
+            index.close()
+    finally:
+        FIXTURE_REPOS[:] = saved
+        StubGitHubHandler.latency = 0.0
+        client.close()
+        server.shutdown()
+
+# Watch mode on a work tree pushing to a local bare remote: 6 bursts of 20 file writes, one
+# burst every 1.5 s, with a 0.5 s debounce and a 1 s minimum push interval
+def bench_watch(bursts=6, writes=20, gap=1.5):
+    pusher2._credential_provider = pusher2.CredentialProvider([pusher2.MemoryBackend("stub", "stub")])
+    for poll in (False, True):
+        with tempfile.TemporaryDirectory() as work:
+            remote = make_bare_remote(os.path.join(work, "remote.git"))
+            tree = os.path.join(work, "tree")
+            make_work_tree(tree, dirs=2, files_per_dir=2, size=1024)
+            subprocess.run(f"git add -A && git commit -qm init && git remote add origin {remote} && git push -q -u origin HEAD",
+                           shell=True, cwd=tree, check=True, capture_output=True)
+            stop = threading.Event()
+            result = {}
+
+            def watch():
+                with contextlib.redirect_stdout(io.StringIO()):
+                    result.update(pusher2.watch_repository(tree, debounce=0.5, min_interval=1.0, poll=poll, stop=stop))
+
+            watcher = threading.Thread(target=watch)
+            watcher.start()
+            time.sleep(1.5)  # let the watcher settle before the first burst
+            for burst in range(bursts):
+                for n in range(writes):
+                    with open(os.path.join(tree, f"burst-{n:02d}.txt"), "w") as f:
+                        f.write(f"burst {burst} write {n}\n")
+                    time.sleep(0.01)
+                time.sleep(gap)
+            time.sleep(2.0)
+            stop.set()
+            watcher.join()
+            commits = subprocess.run(["git", "rev-list", "--count", "HEAD"], cwd=remote, capture_output=True, text=True).stdout.strip()
+            assert not result["failed"] and int(commits) == result["pushes"] + 1, result
+            print(f"{result['watcher']:<15} writes={bursts * writes:<4} events={result['events']:<4} batches={result['batches']:<3} "
+                  f"pushes={result['pushes']:<3} empty={result['empty']} failed={result['failed']}  commits on remote={commits}")
+
+# Push 60 work trees to local bare remotes whose pre-receive hook sleeps 0.3 s (network round
+# trips): 48 with changes, 8 clean, 3 without a remote and one whose hook hangs past the 5 s
+# per-repository timeout. Sequential versus 8 workers.
+def bench_push_all(repos=60, latency=0.3, timeout=5.0):
+    pusher2._credential_provider = pusher2.CredentialProvider([pusher2.MemoryBackend("stub", "stub")])
+    for workers in (1, 8):
+        with tempfile.TemporaryDirectory() as work:
+            for n in range(repos):
+                tree = os.path.join(work, "trees", f"repo{n:02d}")
+                make_work_tree(tree, dirs=2, files_per_dir=4, size=4096)
+                if n >= repos - 3:
+                    continue  # no remote
+                remote = make_bare_remote(os.path.join(work, "remotes", f"repo{n:02d}.git"))
+                subprocess.run(f"git add -A && git commit -qm init && git remote add origin {remote} && git push -q -u origin HEAD",
+                               shell=True, cwd=tree, check=True, capture_output=True)
+                hook = os.path.join(remote, "hooks", "pre-receive")
+                with open(hook, "w") as f:
+                    f.write(f"#!/bin/sh\nsleep {60 if n == 0 else latency}\n")
+                os.chmod(hook, 0o755)
+                if n < repos - 11:  # the last 8 with a remote stay clean
+                    with open(os.path.join(tree, "dir00", "f00.bin"), "ab") as f:
+                        f.write(b"changed")
+            paths = pusher2.find_repositories(os.path.join(work, "trees"))
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                results = pusher2.publish_repositories(paths, "bench", max_workers=workers, timeout=timeout)
+            elapsed = time.perf_counter() - start
+            counts = {}
+            for r in results:
+                counts[r["status"]] = counts.get(r["status"], 0) + 1
+            print(f"workers={workers}  {len(paths)} repos in {elapsed:.2f} s  " + "  ".join(f"{k}={v}" for k, v in sorted(counts.items())))
+            assert counts == {"pushed": repos - 12, "up-to-date": 8, "failed": 3, "timeout": 1}, counts
+
+# One commit pushed to a primary and two backup bare remotes whose pre-receive hook sleeps 1 s:
+# three sequential pushes versus the fan-out, then the policies with one backup rejecting
+def bench_mirror_push(latency=1.0):
+    with tempfile.TemporaryDirectory() as work:
+        tree = os.path.join(work, "tree")
+        make_work_tree(tree, dirs=4, files_per_dir=8, size=64 * 1024)
+        subprocess.run("git add -A && git commit -qm init", shell=True, cwd=tree, check=True)
+        targets = {}
+        for name in ("origin", "backup1", "backup2"):
+            remote = make_bare_remote(os.path.join(work, f"{name}.git"), failing_hook=name == "backup2")
+            hook = os.path.join(remote, "hooks", "pre-receive")
+            with open(hook, "a") as f:
+                f.write(f"#!/bin/sh\nsleep {latency}\n" if name != "backup2" else f"sleep {latency}\n")
+            os.chmod(hook, 0o755)
+            targets[name] = remote
+
+        def new_commit(n):
+            with open(os.path.join(tree, "dir00", "f00.bin"), "ab") as f:
+                f.write(os.urandom(1024))
+            subprocess.run(["git", "commit", "-qam", f"change {n}"], cwd=tree, check=True)
+
+        start = time.perf_counter()
+        for url in targets.values():
+            subprocess.run(["git", "push", "-q", url, "HEAD:refs/heads/main"], cwd=tree, check=True)
+        print(f"sequential   3 remotes  {time.perf_counter() - start:.2f} s")
+        new_commit(1)
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            ok, results = pusher2.push_to_remotes(targets, "main", "all", cwd=tree)
+        print(f"fan-out      3 remotes  {time.perf_counter() - start:.2f} s  ok={ok}  "
+              + " ".join(f"{r['remote']}={r['status']}/{r['seconds']:.2f}s" for r in results))
+        assert ok and all(r["status"] == "pushed" for r in results), results
+
+        with open(os.path.join(targets["backup2"], "fail-after"), "w") as f:
+            f.write("0")
+        for n, policy in enumerate(pusher2.MIRROR_POLICIES, start=2):
+            new_commit(n)
+            with contextlib.redirect_stdout(io.StringIO()):
+                ok, results = pusher2.push_to_remotes(targets, "main", policy, cwd=tree)
+            print(f"{policy:<12} backup2 rejecting  ok={ok}  " + " ".join(f"{r['remote']}={r['status']}" for r in results))
+            assert ok == (policy != "all"), f"policy {policy} returned ok={ok}"
+            assert {r["remote"]: r["status"] for r in results} == {"origin": "pushed", "backup1": "pushed", "backup2": "rejected"}
+
+# Onboard 150 repositories from a manifest against the stub API with 50 ms latency: 30 already
+# exist and 20 get an initial push of a 50-file directory, 5 of which fail. Sequential versus
+# 8 workers, then a re-run of the same (YAML) manifest that must create nothing and finish only
+# the 5 failed initial pushes.
+def bench_bulk_create(count=150, existing=30, sources=20, latency=0.05):
+    saved = list(FIXTURE_REPOS)
+    server, base_url = start_stub_server()
+    StubGitHubHandler.latency = latency
+    client = stub_client(base_url)
+    try:
+        with tempfile.TemporaryDirectory() as work:
+            source = os.path.join(work, "template")
+            for i in range(50):
+                os.makedirs(os.path.join(source, f"src/pkg{i % 5}"), exist_ok=True)
+                with open(os.path.join(source, f"src/pkg{i % 5}/module{i:02d}.py"), "w") as f:
+                    f.write(f"VALUE = {i}\n" * 20)
+            for workers in (1, 8):
+                FIXTURE_REPOS[:] = [{"name": f"team-{n:03d}", "full_name": f"stub/team-{n:03d}", "html_url": ""} for n in range(existing)]
+                STUB_REPOS.clear()
+                manifest = {"defaults": {"visibility": "private", "description": "Team service"},
+                            "repos": [dict({"name": f"team-{n:03d}"}, **({"source": "template"} if n >= count - sources else {}))
+                                      for n in range(count)]}
+                path = os.path.join(work, "manifest.json")
+                with open(path, "w") as f:
+                    json.dump(manifest, f)
+                StubGitHubHandler.reject_blobs = {f"team-{n:03d}" for n in range(count - 5, count)}
+                with contextlib.redirect_stdout(io.StringIO()):
+                    report = pusher2.bulk_create(client, pusher2.load_manifest(path), max_workers=workers)
+                StubGitHubHandler.reject_blobs = set()
+                pushed = sum(1 for r in report["repos"] if r["pushed"])
+                print(f"workers={workers}  {report['summary']}  pushed={pushed}")
+                statuses = {k: v for k, v in report["summary"].items() if k not in ("requests", "seconds")}
+                assert statuses == {"exists": existing, "created": count - existing - 5, "failed": 5}, statuses
+                assert pushed == sources - 5
+
+            try:
+                import yaml
+            except ImportError:
+                return
+            path = os.path.join(work, "manifest.yaml")
+            with open(path, "w") as f:
+                yaml.safe_dump(manifest, f)
+            for label in ("re-run (yaml)", "again"):
+                with contextlib.redirect_stdout(io.StringIO()):
+                    report = pusher2.bulk_create(client, pusher2.load_manifest(path))
+                pushed = sum(1 for r in report["repos"] if r["pushed"])
+                print(f"{label:<14} {report['summary']}  pushed={pushed}")
+                statuses = {k: v for k, v in report["summary"].items() if k not in ("requests", "seconds")}
+                resumed = 5 if label == "re-run (yaml)" else 0
+                assert statuses == dict({"exists": count - resumed}, **({"resumed": resumed} if resumed else {})), statuses
+                assert pushed == resumed
+    finally:
+        StubGitHubHandler.latency = 0.0
+        StubGitHubHandler.reject_blobs = set()
+        FIXTURE_REPOS[:] = saved
+        STUB_REPOS.clear()
+        client.close()
+        server.shutdown()
+
+BENCHMARKS = {
+    "session": bench_session,
+    "list-repos": bench_list_repos,
+    "download": bench_download,
+    "bulk-download": bench_bulk_download,
+    "tree": bench_tree,
+    "probe": bench_probe,
+    "credentials": bench_credentials,
+    "cli-startup": bench_cli_startup,
+    "rate-limit": bench_rate_limit,
+    "engines": bench_engines,
+    "api-push": bench_api_push,
+    "stage": bench_stage,
+    "chunked-publish": bench_chunked_publish,
+    "push-progress": bench_push_progress,
+    "large-files": bench_large_files,
+    "tracing": bench_tracing,
+    "download-cache": bench_download_cache,
+    "sync": bench_sync,
+    "fetch-modes": bench_fetch_modes,
+    "index": bench_index,
+    "watch": bench_watch,
+    "push-all": bench_push_all,
+    "mirror-push": bench_mirror_push,
+    "bulk-create": bench_bulk_create,
+}
+
+# End-to-end suite ################################################################################
+
+# Every user-facing workflow, run against the stub API (started once by the suite) and local bare
+# repositories standing in for github.com. Each workflow runs in its own worker process so its
+# peak RSS is not inflated by the stub server or by the workflows before it.
+SUITE_WORKFLOWS = ("create", "list", "tree", "download", "download-large", "push", "update")
+SUITE_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark-baseline.json")
+SUITE_THRESHOLD = 0.25  # allowed relative slowdown before a metric counts as a regression
+SUITE_MIN_DELTA = {"p50_ms": 2.0, "peak_rss_mb": 5.0}  # ignore differences below this noise floor
+SUITE_WARMUP = 2  # untimed iterations before measuring (connection setup, imports, disk cache)
+# Stub quota sent as X-RateLimit-* headers, small enough that the busier workflows reach the last
+# 10% of a window and the scheduler's pacing is part of what is measured
+SUITE_QUOTA = 500
+SUITE_QUOTA_WINDOW = 2.0
+SUITE_LARGE_FILE = 256 * 1024 * 1024  # streamed by download-large, so peak RSS covers big bodies
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, int(round(q * len(values) + 0.5)) - 1))]
+
+# Fixture repos and files the tree and download workflows read
+def add_suite_fixtures(base_url):
+    add_stub_repo("suite-tree", dirs=20, files_per_dir=250, size=256)
+    add_stub_repo("suite-download", dirs=4, files_per_dir=50, size=64 * 1024)
+    return add_fixture_file("suite-large.bin", SUITE_LARGE_FILE, base_url)
+
+# Set up one workflow and return (run(i) -> units processed, unit name); run is timed per call
+def suite_workflow(name, client, work):
+    def chdir(path):
+        os.chdir(path)
+        pusher2.invalidate_repo_state()
+
+    if name == "create":
+        return lambda i: int(pusher2.create_repo(f"suite-{i}") is not None), "repos"
+    if name == "list":
+        def run(i):
+            client._etag_cache.clear()
+            return len(pusher2.fetch_all_repositories(client))
+        return run, "repos"
+    if name == "tree":
+        def run(i):
+            client._etag_cache.clear()
+            return len(pusher2.fetch_repo_tree(client, "stub", "suite-tree").files())
+        return run, "files"
+    if name == "download":
+        files = pusher2.fetch_repo_tree(client, "stub", "suite-download").files()
+        def run(i):
+            downloaded, failed = pusher2.download_files(files, client, os.path.join(work, f"download-{i}"))
+            assert not failed, failed
+            return sum(f["size"] for f in files)
+        return run, "bytes"
+    if name == "download-large":
+        entry = add_fixture_file("suite-large.bin", SUITE_LARGE_FILE, client.base_url)
+        def run(i):
+            directory = os.path.join(work, f"download-large-{i}")
+            pusher2.stream_download(entry, client, directory)
+            shutil.rmtree(directory)
+            return entry["size"]
+        return run, "bytes"
+    if name == "push":
+        def run(i):
+            tree = os.path.join(work, f"push-{i}")
+            make_work_tree(tree, dirs=4, files_per_dir=25, size=16 * 1024)
+            make_bare_remote(os.path.join(work, "stub", f"push-{i}.git"))
+            chdir(tree)
+            start = time.perf_counter()
+            assert pusher2.verify_and_create_commit() and pusher2.push_to_github(f"push-{i}")
+            return 100 * 16 * 1024, time.perf_counter() - start
+        return run, "bytes"
+    if name == "update":
+        tree = os.path.join(work, "update")
+        make_work_tree(tree, dirs=4, files_per_dir=25, size=16 * 1024)
+        make_bare_remote(os.path.join(work, "stub", "update.git"))
+        chdir(tree)
+        assert pusher2.verify_and_create_commit() and pusher2.push_to_github("update")
+        def run(i):
+            for f in range(10):
+                with open(os.path.join(tree, f"dir{f % 4:02d}", f"f{f:02d}.bin"), "ab") as out:
+                    out.write(os.urandom(16 * 1024))
+            start = time.perf_counter()
+            assert pusher2.update_repository(f"Update {i}")
+            return 10 * 16 * 1024, time.perf_counter() - start
+        return run, "bytes"
+    raise ValueError(f"unknown workflow {name}")
+
+# Worker process: run one workflow `iterations` times against base_url and print its metrics
+def suite_worker(name, iterations, base_url):
+    client = stub_client(base_url)
+    pusher2._credential_provider = pusher2.CredentialProvider([pusher2.MemoryBackend("stub", "stub")])
+    pusher2._github_client = client
+    with tempfile.TemporaryDirectory() as work:
+        pusher2.GITHUB_URL = "file://" + work
+        timings, units = [], 0
+        with contextlib.redirect_stdout(io.StringIO()):
+            run, unit = suite_workflow(name, client, work)
+            for i in range(-SUITE_WARMUP, iterations):
+                start = time.perf_counter()
+                result = run(i)
+                elapsed = time.perf_counter() - start
+                if isinstance(result, tuple):  # workflows that exclude their own setup
+                    result, elapsed = result
+                if i >= 0:
+                    timings.append(elapsed)
+                    units += result
+        os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    client.close()
+    if unit == "bytes":
+        units, unit = units / 2**20, "MiB"
+    print(json.dumps({
+        "iterations": iterations,
+        "p50_ms": statistics.median(timings) * 1000,
+        "p95_ms": percentile(timings, 0.95) * 1000,
+        "p99_ms": percentile(timings, 0.99) * 1000,
+        "throughput": units / sum(timings),
+        "unit": f"{unit}/s",
+        "peak_rss_mb": peak_rss_mb(),
+        "rate_limited": client.scheduler.counters["rate_limited"],
+        "throttled_s": client.scheduler.counters["throttled_seconds"],
+    }))
+
+# Metrics that got worse than the baseline by more than the threshold (and the noise floor).
+# The gate uses the median and throughput; p95/p99 over a few dozen runs are reported but too
+# noisy to fail a build on.
+def suite_regressions(results, baseline, threshold=SUITE_THRESHOLD):
+    found = []
+    for name, metrics in results.items():
+        before = baseline.get(name)
+        if not before:
+            continue
+        for key in ("p50_ms", "peak_rss_mb"):
+            if metrics[key] > before[key] * (1 + threshold) and metrics[key] - before[key] > SUITE_MIN_DELTA[key]:
+                found.append(f"{name}: {key} {before[key]:.2f} -> {metrics[key]:.2f}")
+        if metrics["throughput"] < before["throughput"] * (1 - threshold):
+            found.append(f"{name}: throughput {before['throughput']:.1f} -> {metrics['throughput']:.1f} {metrics['unit']}")
+    return found
+
+# python benchmark.py suite [workflows] [--iterations N] [--save] [--baseline PATH] [--threshold F]
+def run_suite(argv):
+    parser = argparse.ArgumentParser(prog="benchmark.py suite", description="End-to-end workflow benchmarks with a regression gate.")
+    parser.add_argument("workflows", nargs="*", help=f"any of {', '.join(SUITE_WORKFLOWS)} (default: all)")
+    parser.add_argument("--iterations", type=int, default=30)
+    parser.add_argument("--baseline", default=SUITE_BASELINE)
+    parser.add_argument("--save", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=SUITE_THRESHOLD)
+    args = parser.parse_args(argv)
+    unknown = set(args.workflows) - set(SUITE_WORKFLOWS)
+    if unknown:
+        parser.error(f"unknown workflow(s): {', '.join(sorted(unknown))}")
+
+    server, base_url = start_stub_server()
+    add_suite_fixtures(base_url)
+    StubGitHubHandler.quota, StubGitHubHandler.quota_window = SUITE_QUOTA, SUITE_QUOTA_WINDOW
+    results = {}
+    try:
+        for name in args.workflows or SUITE_WORKFLOWS:
+            worker = subprocess.run([sys.executable, os.path.abspath(__file__), "suite-worker", name, str(args.iterations), base_url],
+                                    capture_output=True, text=True)
+            if worker.returncode != 0:
+                print(f"{name}: worker failed\n{worker.stderr}")
+                return 1
+            results[name] = json.loads(worker.stdout.strip().splitlines()[-1])
+    finally:
+        StubGitHubHandler.quota = None
+        server.shutdown()
+
+    print(f"{'workflow':<14} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'throughput':>22} {'peak RSS':>10} {'throttled':>10} {'limited':>7}")
+    for name, m in results.items():
+        print(f"{name:<14} {m['p50_ms']:9.2f} {m['p95_ms']:9.2f} {m['p99_ms']:9.2f} "
+              f"{m['throughput']:>12.1f} {m['unit']:<9} {m['peak_rss_mb']:7.1f} MiB {m['throttled_s']:9.2f}s {m['rate_limited']:>7}")
+
+    if args.save:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"baseline written to {args.baseline}")
+        return 0
+    try:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    except FileNotFoundError:
+        print(f"no baseline at {args.baseline} (run with --save to create one)")
+        return 0
+    regressions = suite_regressions(results, baseline, args.threshold)
+    for line in regressions:
+        print(f"REGRESSION {line}")
+    print(f"{len(regressions)} regression(s) beyond {args.threshold:.0%} against {args.baseline}")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["suite"]:
+        sys.exit(run_suite(sys.argv[2:]))
+    if sys.argv[1:2] == ["suite-worker"]:
+        sys.exit(suite_worker(sys.argv[2], int(sys.argv[3]), sys.argv[4]))
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        print(f"\n== {name} ==")
+        BENCHMARKS[name]()